@@ -1,20 +1,48 @@
 import os
+import argparse
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import pandas as pd
-import requests
 import hashlib
-import json
+import json_repair
+import orjson
+import re
+import sqlite3
+import threading
+import time
+import tiktoken
 from tqdm import tqdm
 from pathlib import Path
-from multiprocessing.pool import ThreadPool
+from urllib.parse import urlsplit
+
+try:
+    import hyperscan
+except ImportError:  # optional, falls back to re
+    hyperscan = None
 
 INPUT_FILE = "toprocess.txt"
-OUTPUT_FILE = "summaries.xlsx"
+INDEX_FILE = "summaries.db"  # SQLite working store, kept between runs
+OUTPUT_FILE = "summaries.xlsx"  # written only with --export-xlsx
 SOURCES_DIR = "sources"
 SUMMARIES_DIR = "summaries"
-CONCURRENCY = 10
+CONCURRENCY = 10  # initial requests in flight per API, adapted while running
+MAX_CONCURRENCY = 50
+FORCE_RESCRAPE = False  # re-crawl URLs even if their source file exists
 
 MODEL = "openai/gpt-4.1-mini"  # or "openai/gpt-4.1"
-MAX_CHARS = 8000  # safety limit per file
+MAX_TOKENS = 2000  # safety limit per file
+TOKENIZER = "o200k_base"  # tiktoken encoding used to count MAX_TOKENS
+MIN_CHARS = 200  # shorter pages are treated as content missing
+BATCH_SIZE = 4  # files summarized per OpenRouter request
+BATCH_WAIT = 0.5  # seconds to wait for a batch to fill up
+
+RETRIES = 5
+RETRY_BACKOFF = 1.0  # seconds, doubled after every attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504, 524}
+BREAKER_THRESHOLD = 10  # consecutive failures before a host is paused
+BREAKER_COOLDOWN = 30  # seconds a paused host is left alone
 
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")  # set this in your shell
@@ -27,32 +55,209 @@ if not JINA_API_KEY:
     raise ValueError("JINA_API_KEY environment variable is not set")
 
 
-def crawl(src_url):
+JINA_HEADERS = {"Authorization": f"Bearer {JINA_API_KEY}", "X-Return-Format": "text"}
+OPENROUTER_HEADERS = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "HTTP-Referer": "summarize-tabs.py",
+    "X-Title": "File Summarizer Script",
+}
+
+
+_host_failures = {}  # host -> consecutive failed attempts
+_host_paused_until = {}  # host -> time.monotonic() when it may be retried
+
+
+def record_attempt(host, failed):
+    """Circuit breaker: pauses a host after BREAKER_THRESHOLD failures in a row."""
+    if not failed:
+        _host_failures[host] = 0
+        return
+    _host_failures[host] = _host_failures.get(host, 0) + 1
+    if _host_failures[host] >= BREAKER_THRESHOLD:
+        _host_failures[host] = 0
+        _host_paused_until[host] = time.monotonic() + BREAKER_COOLDOWN
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on the requests in flight to one host: each success adds a
+    quarter permit (up to MAX_CONCURRENCY), a throttled or failed request
+    halves them (down to 1). Only requests sent after the last cut can cut
+    again, so a burst of 429s answering the same window halves just once.
+    """
+
+    def __init__(self, permits):
+        self.permits = permits
+        self.in_flight = 0
+        self.generation = 0  # bumped on every cut
+        self._waiters = deque()
+
+    async def acquire(self):
+        """Waits for a free permit; returns the generation to pass to release."""
+        while self.in_flight >= int(self.permits):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        self.in_flight += 1
+        return self.generation
+
+    def release(self, generation, throttled):
+        self.in_flight -= 1
+        if not throttled:
+            self.permits = min(MAX_CONCURRENCY, self.permits + 0.25)
+        elif generation == self.generation:
+            self.permits = max(1, self.permits / 2)
+            self.generation += 1
+
+        free = int(self.permits) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+_host_limiters = {}  # host -> AdaptiveLimiter
+
+
+def retry_after(response):
+    """Returns the Retry-After delay in seconds, if the server sent one."""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+async def fetch(client, method, url, **kwargs):
+    """
+    Performs an HTTP request, retrying with exponential backoff (or the
+    server's Retry-After) on RETRY_STATUSES and connection errors.
+    Returns (status, body) of the last response.
+    """
+    host = urlsplit(url).hostname
+    if host not in _host_limiters:
+        _host_limiters[host] = AdaptiveLimiter(CONCURRENCY)
+    limiter = _host_limiters[host]
+
+    for attempt in range(RETRIES + 1):
+        paused = _host_paused_until.get(host, 0) - time.monotonic()
+        if paused > 0:
+            await asyncio.sleep(paused)
+
+        generation = await limiter.acquire()
+        response = None
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            if attempt == RETRIES:
+                raise
+        finally:
+            failed = response is None or response.status_code in RETRY_STATUSES
+            limiter.release(generation, failed)
+            record_attempt(host, failed)
+
+        if not failed or attempt == RETRIES:
+            return response.status_code, response.text
+
+        wait = retry_after(response) if response else None
+        if wait:
+            # The server said when to come back, hold every request to it
+            paused_until = max(_host_paused_until.get(host, 0), time.monotonic() + wait)
+            _host_paused_until[host] = paused_until
+        await asyncio.sleep(wait or RETRY_BACKOFF * 2**attempt)
+
+
+async def crawl(client, src_url):
     url = "https://r.jina.ai/" + src_url
-    headers = {"Authorization": f"Bearer {JINA_API_KEY}", "X-Return-Format": "text"}
 
-    response = requests.get(url, headers=headers)
+    status, text = await fetch(client, "GET", url, headers=JINA_HEADERS)
 
-    if response.status_code == 200:
-        return 200, response.text
+    if status == 200:
+        return 200, text
     else:
-        return response.status_code, ""
+        return status, ""
+
+
+def replace_file(path, text):
+    """Writes text to path atomically, so readers never see a partial file."""
+    tmp_file = Path(f"{path}.{threading.get_ident()}.tmp")
+    tmp_file.write_text(text, encoding="utf-8")
+    os.replace(tmp_file, path)
+
+
+# A single thread does all file writes, so workers never wait on the disk
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+_pending_writes = {}  # path -> future of its latest queued write
+
+
+def write_file(path, text):
+    """Queues text to be written to path by the writer thread."""
+    path = str(path)
+    future = _writer.submit(replace_file, path, text)
+    _pending_writes[path] = future
+
+    def done(_):
+        if _pending_writes.get(path) is future:
+            del _pending_writes[path]
+
+    future.add_done_callback(done)
+
+
+async def wait_for_write(path):
+    """Waits until the write queued for path, if any, has reached the disk."""
+    future = _pending_writes.get(str(path))
+    if future:
+        await asyncio.wrap_future(future)
+
+
+async def flush_writes():
+    """Waits until every queued write has reached the disk."""
+    futures = list(_pending_writes.values())
+    await asyncio.gather(*[asyncio.wrap_future(f) for f in futures])
+
+
+_listings = {}  # directory -> names of the files it held when the run started
+
+
+def scan_dirs(*dirs):
+    """Lists each directory once, so cache lookups don't stat() every file."""
+    for directory in dirs:
+        with os.scandir(directory) as entries:
+            _listings[directory] = {e.name for e in entries if e.is_file()}
 
 
-def scrape_api(args):
-    idx, url = args
+def listed(directory, name):
+    return name in _listings[directory]
 
-    # Compute MD5 hash of the URL
-    url_hash = hashlib.md5(url.encode("utf-8")).hexdigest()
+
+def url_fingerprint(url):
+    """Returns the hash naming the files kept for url."""
+    url_bytes = url.encode("utf-8")
+    url_hash = hashlib.blake2b(url_bytes, digest_size=16).hexdigest()
+
+    # Sources crawled before the switch from MD5 are still valid
+    if not listed(SOURCES_DIR, f"{url_hash}.txt"):
+        legacy_hash = hashlib.md5(url_bytes).hexdigest()
+        if listed(SOURCES_DIR, f"{legacy_hash}.txt"):
+            return legacy_hash
+    return url_hash
+
+
+async def scrape_api(client, url):
+
+    url_hash = url_fingerprint(url)
     file_name = f"{url_hash}.txt"
     output_file = os.path.join(SOURCES_DIR, file_name)
+    status_file = Path(SOURCES_DIR, f"{url_hash}.status")
 
-    if os.path.exists(output_file):
-        # File already exists
-        return idx, file_name, "exists"
+    if listed(SOURCES_DIR, file_name) and not FORCE_RESCRAPE:
+        # File already exists, reuse the status it was crawled with
+        if listed(SOURCES_DIR, status_file.name):
+            return url, file_name, status_file.read_text(encoding="utf-8")
+        return url, file_name, "exists"
 
     try:
-        code, text = crawl(url)
+        code, text = await crawl(client, url)
 
         # +------+-------+-------------------------------+------------------------+
         # | Code | Times | Meaning                       | What usually causes it |
@@ -63,141 +268,414 @@ def scrape_api(args):
         # | 503  | 5     | Service Unavailable           | Server overloaded      |
         # | 524  | 1     | A Timeout Occurred            | Cloudflare server time |
         # +------+-------+-------------------------------+------------------------+
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(text)
+        write_file(output_file, text)
+        write_file(status_file, str(code))
+        # The index row is updated next, it mustn't point to a missing file
+        await wait_for_write(output_file)
+        await wait_for_write(status_file)
+
+        # A fresh crawl invalidates any summary cached for the old source
+        for name in (f"{url_hash}.json", file_name):
+            Path(SUMMARIES_DIR, name).unlink(missing_ok=True)
+            _listings[SUMMARIES_DIR].discard(name)
 
-        return idx, file_name, code
+        return url, file_name, code
 
     except Exception as e:
         # On error, still log it
-        return idx, file_name, f"error: {str(e)}".replace('"', '""')
+        return url, file_name, f"error: {str(e)}".replace('"', '""')
+
+
+def normalize_result(result) -> dict:
+    """Coerces one model answer into {"status": ..., "summary": ...}."""
+    if not isinstance(result, dict):
+        return {"status": "content missing", "summary": ""}
+
+    # Normalize keys
+    status = str(result.get("status", "")).strip().lower()
+    summary = str(result.get("summary", "")).strip()
+
+    if status not in ("content missing", "summary"):
+        # Fallback if model didn't follow instructions
+        return {"status": "content missing", "summary": ""}
+
+    if status == "content missing":
+        return {"status": "content missing", "summary": ""}
+
+    # status == "summary"
+    return {"status": "summary", "summary": summary}
+
 
+# ```json ... ``` anywhere in the answer; the closing fence is lost on truncation
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|$)", re.DOTALL | re.IGNORECASE)
 
-def call_openrouter_for_file(text: str) -> dict:
+
+async def call_openrouter_for_files(client, texts: list) -> list:
     """
-    Sends the file content to OpenRouter and returns a dict:
+    Sends the content of several files to OpenRouter in one request and
+    returns one dict per file, in the same order:
       {
         "status": "content missing" or "summary",
         "summary": "<three sentence summary or empty string>"
       }
     """
-    # Truncate very large files just to be safe
-    if len(text) > MAX_CHARS:
-        text = text[:MAX_CHARS]
-
     system_prompt = (
-        "You will receive text scraped from a web page. "
+        "You will receive one or more documents, each containing text scraped from a web page. "
         "Sometimes it is mostly boilerplate (navigation menus, login prompts, "
         "error messages, CAPTCHAs, or 'unusual traffic' messages). "
         "Other times it includes real content (articles, tables, transcripts, etc.).\n\n"
-        "Your task:\n"
+        "Your task, for every document separately:\n"
         "1. Decide if the text contains meaningful page content.\n"
         "   - If it is mostly boilerplate, navigation, or an error/anti-bot page, "
         "     treat it as content missing.\n"
         "   - If it contains substantial real content (even partial), treat it as content present.\n"
-        "2. If content is missing, respond with:\n"
-        '   {"status": "content missing", "summary": ""}\n'
-        "3. If content is present, respond with:\n"
-        '   {"status": "summary", "summary": "<exactly three sentences summarizing the content>"}\n\n'
+        "2. If content is missing, its result is:\n"
+        '   {"id": <document id>, "status": "content missing", "summary": ""}\n'
+        "3. If content is present, its result is:\n"
+        '   {"id": <document id>, "status": "summary", "summary": "<exactly three sentences summarizing the content>"}\n\n'
+        "Respond with a single JSON object holding one result per document:\n"
+        '   {"results": [<result>, ...]}\n\n'
         "Important:\n"
         "- The JSON must be valid and parseable.\n"
+        "- 'id' must be the number of the document the result is for.\n"
         "- 'status' must be exactly either 'content missing' or 'summary'.\n"
         "- If 'status' is 'summary', 'summary' must be exactly three sentences, no bullet points.\n"
         "- Don't introduce the 'summary' with 'the text' or 'the scraped text' or equivalent. e.g. \n"
         "  instead of 'The text is a detailed product listing' just say 'a detailed product listing'."
     )
 
+    documents = "\n\n".join(
+        f"--- DOC {i} START ---\n{text}\n--- DOC {i} END ---"
+        for i, text in enumerate(texts)
+    )
     user_prompt = (
-        "Here is the scraped text from a file. Analyze it according to the instructions.\n\n"
-        "SCRAPED TEXT START\n"
-        f"{text}\n"
-        "SCRAPED TEXT END"
+        "Here is the scraped text from some files. Analyze each according to the instructions.\n\n"
+        f"{documents}"
     )
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "summarize-tabs.py",
-        "X-Title": "File Summarizer Script",
-    }
-
     payload = {
         "model": MODEL,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
-        "max_tokens": 300,
+        "max_tokens": 300 * len(texts),
         "temperature": 0.0,
     }
 
-    resp = requests.post(
+    status, body = await fetch(
+        client,
+        "POST",
         "https://openrouter.ai/api/v1/chat/completions",
-        headers=headers,
-        data=json.dumps(payload),
-        timeout=60,
+        headers=OPENROUTER_HEADERS,
+        json=payload,
     )
-    resp.raise_for_status()
-    data = resp.json()
+    if status in RETRY_STATUSES:
+        # fetch gave up retrying, the service itself is failing
+        raise RuntimeError(f"HTTP {status}: {body[:200]}")
+    if status != 200:
+        # Anything else was rejected for what the batch contains
+        raise ValueError(f"HTTP {status}: {body[:200]}")
+    data = orjson.loads(body)
 
-    content = data["choices"][0]["message"]["content"].strip()
+    content = data["choices"][0]["message"]["content"]
 
     # Sometimes models wrap JSON in markdown; strip that if needed
-    if content.startswith("```"):
-        # remove ```json or ``` and trailing ```
-        content = content.strip("`")
-        # occasionally something like "json\n{...}"
-        if "\n" in content:
-            content = content.split("\n", 1)[1]
+    fenced = _FENCE_RE.search(content)
+    if fenced:
+        content = fenced.group(1)
+
+    try:
+        answer = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # Rescue truncated or slightly malformed JSON before giving up on it
+        answer = json_repair.loads(content)
 
     try:
-        result = json.loads(content)
-    except json.JSONDecodeError:
+        by_id = {int(r["id"]): r for r in answer["results"]}
+    except (KeyError, TypeError, ValueError):
         # Fallback: if parsing fails, treat as content missing
-        return {"status": "content missing", "summary": ""}
+        by_id = {}
 
-    # Normalize keys
-    status = result.get("status", "").strip().lower()
-    summary = result.get("summary", "").strip()
+    # Documents the model skipped are treated as content missing too
+    return [normalize_result(by_id.get(i)) for i in range(len(texts))]
 
-    if status not in ("content missing", "summary"):
-        # Fallback if model didn't follow instructions
-        return {"status": "content missing", "summary": ""}
 
-    if status == "content missing":
-        return {"status": "content missing", "summary": ""}
+_pending = []  # (text, future) waiting to be sent in the next batch
+_pending_timer = None
+_batch_tasks = set()
+# Raised for what a batch contains, rather than by a failing service
+_CONTENT_ERRORS = (KeyError, IndexError, TypeError, ValueError)
 
-    # status == "summary"
-    return {"status": "summary", "summary": summary}
 
+def flush_batch(client):
+    """Sends all pending texts to OpenRouter as one batch."""
+    global _pending, _pending_timer
+    if _pending_timer:
+        _pending_timer.cancel()
+        _pending_timer = None
+    batch, _pending = _pending, []
+    if batch:
+        task = asyncio.create_task(send_batch(client, batch))
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
 
-def summarize_api(args):
-    idx, file_name = args
-    input_file = Path(os.path.join(SOURCES_DIR, file_name))
 
+async def send_batch(client, batch):
+    texts, futures = zip(*batch)
     try:
-        text = input_file.read_text(encoding="utf-8", errors="ignore")
+        results = await call_openrouter_for_files(client, list(texts))
     except Exception as e:
-        return idx, f"file '{input_file.name}' missing"
+        if len(batch) > 1 and isinstance(e, _CONTENT_ERRORS):
+            # Caused by the content: resend each text alone so only the one
+            # at fault fails. Transient errors were already retried by fetch.
+            await asyncio.gather(*(send_batch(client, [item]) for item in batch))
+            return
+        for future in futures:
+            if not future.done():
+                future.set_exception(e)
+        return
+    for future, result in zip(futures, results):
+        if not future.done():
+            future.set_result(result)
+
+
+async def call_openrouter_for_file(client, text: str) -> dict:
+    """
+    Queues the file content for OpenRouter and returns its result. Texts are
+    sent BATCH_SIZE at a time, or after BATCH_WAIT seconds if fewer are
+    waiting, so the system prompt and round-trip are shared.
+    """
+    global _pending_timer
+    # Truncate very large files just to be safe, before they join a batch
+    text = truncate_tokens(text)
+    future = asyncio.get_running_loop().create_future()
+    _pending.append((text, future))
+    if len(_pending) >= BATCH_SIZE:
+        flush_batch(client)
+    elif not _pending_timer:
+        _pending_timer = asyncio.get_running_loop().call_later(
+            BATCH_WAIT, flush_batch, client
+        )
+    return await future
+
+
+_ENCODING = tiktoken.get_encoding(TOKENIZER)
+
+
+def truncate_tokens(text: str) -> str:
+    """Cuts text to MAX_TOKENS; special-token strings count as plain text."""
+    return _ENCODING.decode(_ENCODING.encode_ordinary(text)[:MAX_TOKENS])
+
+
+# Anti-bot, error and login-wall phrases; matched case-insensitively
+BOILERPLATE_PATTERNS = [
+    r"unusual traffic",
+    r"access denied",
+    r"are you a (robot|human)",
+    r"verify (that )?you are (a )?human",
+    r"(enable|turn on) javascript",
+    r"javascript is (disabled|required)",
+    r"captcha",
+    r"checking your browser",
+    r"cloudflare ray id",
+    r"attention required",
+    r"403 forbidden",
+    r"too many requests",
+    r"(log|sign) ?in (is )?required",
+    r"(log|sign) ?in to continue",
+    r"bitte (melden sie sich an|anmelden)",
+    r"veuillez vous (connecter|identifier)",
+    r"inicia sesi[oó]n para continuar",
+    r"accedi per continuare",
+    r"fa[cç]a login para continuar",
+    r"войдите,? чтобы продолжить",
+    r"ログインしてください",
+    r"请登录",
+    r"請登入",
+    r"로그인이 필요합니다",
+]
+
+# Pages this short can't hold much more than these anti-bot/error messages
+_BOILERPLATE_MAX_CHARS = 2000
+
+
+def compile_patterns(patterns):
+    """
+    Returns a function telling whether a text matches any of patterns, all
+    scanned in a single pass: a Hyperscan database when available, otherwise
+    one re alternation.
+    """
+    if hyperscan is None:
+        regex = re.compile("|".join(f"(?:{p})" for p in patterns), re.I)
+        return lambda text: regex.search(text) is not None
+
+    flags = (
+        hyperscan.HS_FLAG_CASELESS
+        | hyperscan.HS_FLAG_SINGLEMATCH
+        | hyperscan.HS_FLAG_UTF8
+    )
+    db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    db.compile(
+        expressions=[p.encode("utf-8") for p in patterns],
+        ids=list(range(len(patterns))),
+        elements=len(patterns),
+        flags=[flags] * len(patterns),
+    )
+
+    def on_match(*_):
+        return True  # stop scanning at the first match
+
+    def matches(text):
+        try:
+            db.scan(text.encode("utf-8"), match_event_handler=on_match)
+        except hyperscan.ScanTerminated:
+            return True
+        return False
+
+    return matches
+
+
+_is_boilerplate = compile_patterns(BOILERPLATE_PATTERNS)
+
+
+def looks_missing(text: str) -> bool:
+    """Cheap check for pages that aren't worth an OpenRouter call."""
+    text = text.strip()
+    if len(text) < MIN_CHARS:
+        return True
+    return len(text) < _BOILERPLATE_MAX_CHARS and _is_boilerplate(text)
+
+
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+_body_results = {}  # body hash -> result, shared by all summarize workers
+_body_locks = {}  # body hash -> lock, so duplicates wait on a single LLM call
+
+
+def body_hash(text: str) -> str:
+    """Fingerprint of a page body that ignores case, whitespace and digits."""
+    normalized = _SPACE_RE.sub(" ", _DIGITS_RE.sub("", text.lower())).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def summarized_body(key):
+    """Returns the result of an earlier run for a page with body hash key, if any."""
+    for (file_name,) in _index.execute(
+        "SELECT file FROM links WHERE body_hash = ?", (key,)
+    ):
+        result_file = Path(SUMMARIES_DIR, f"{Path(file_name).stem}.json")
+        if listed(SUMMARIES_DIR, result_file.name):
+            return orjson.loads(result_file.read_bytes())
+    return None
+
+
+async def summarize_text(client, text: str, key: str) -> dict:
+    """
+    Same as call_openrouter_for_file, but pages whose bodies normalize to the
+    same text (boilerplate, anti-bot pages, ...) share one OpenRouter call.
+    key is the body_hash of text.
+    """
+    async with _body_locks.setdefault(key, asyncio.Lock()):
+        if key not in _body_results:
+            result = summarized_body(key)
+            if result is None:
+                result = await call_openrouter_for_file(client, text)
+            _body_results[key] = result
+    return _body_results[key]
+
+
+async def summarize_api(client, args):
+    url, file_name = args
+    input_file = Path(os.path.join(SOURCES_DIR, file_name))
+    output_file = os.path.join(SUMMARIES_DIR, file_name)
+    result_file = Path(SUMMARIES_DIR, f"{input_file.stem}.json")
+
+    # Reuse the result of a previous run instead of calling OpenRouter again
+    if listed(SUMMARIES_DIR, result_file.name):
+        result = orjson.loads(result_file.read_bytes())
+        return url, result["status"], None
+    if listed(SUMMARIES_DIR, file_name) and os.path.getsize(output_file) > 0:
+        # Summary written before the .json sidecar existed
+        return url, "summary", None
 
     try:
-        result = call_openrouter_for_file(text)
+        # The source may have just been crawled and still be queued for writing
+        await wait_for_write(input_file)
+        text = input_file.read_text(encoding="utf-8", errors="ignore")
     except Exception as e:
-        return idx, f"Error calling OpenRouter for {input_file.name}: {e}"
+        return url, f"file '{input_file.name}' missing", None
 
-    output_file = os.path.join(SUMMARIES_DIR, file_name)
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(result["summary"])
+    key = body_hash(text)
+    if looks_missing(text):
+        result = {"status": "content missing", "summary": ""}
+    else:
+        try:
+            result = await summarize_text(client, text, key)
+        except Exception as e:
+            error = f"Error calling OpenRouter for {input_file.name}: {e}"
+            return url, error, None
+
+    write_file(output_file, result["summary"])
+    write_file(result_file, orjson.dumps(result).decode())
+    await wait_for_write(output_file)
+    await wait_for_write(result_file)
+
+    return url, result["status"], key
+
+
+async def process_all_async(scrape_todo, summarize_todo, on_scraped, on_summarized):
+    """
+    Runs both stages at once over one shared HTTP/2 client, each capped at
+    MAX_CONCURRENCY calls in flight (the requests themselves are paced by
+    each host's AdaptiveLimiter): scrape_api for every (url, summarize) of
+    scrape_todo, chained into summarize_api when summarize is set, and
+    summarize_api for every (url, file_name) of summarize_todo. on_scraped
+    and on_summarized are called with each result as soon as it is ready.
+    """
+    scrape_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+    summarize_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+    limits = httpx.Limits(
+        max_connections=2 * MAX_CONCURRENCY,
+        max_keepalive_connections=2 * MAX_CONCURRENCY,
+    )
+
+    summarize_total = len(summarize_todo) + sum(s for _, s in scrape_todo)
+    scrape_bar = tqdm(total=len(scrape_todo), desc="Processing URLs", unit="url")
+    summarize_bar = tqdm(total=summarize_total, desc="Summarizing URLs", unit="url")
 
-    return idx, result["status"]
+    async with httpx.AsyncClient(http2=True, timeout=60, limits=limits) as client:
 
+        async def summarize(args):
+            async with summarize_slots:
+                result = await summarize_api(client, args)
+            summarize_bar.update()
+            on_summarized(result)
 
-def process_all(f, f_name, todo):
-    with ThreadPool(CONCURRENCY) as pool:
-        for i in tqdm(
-            pool.imap_unordered(f, todo), total=len(todo), desc=f_name, unit="url"
-        ):
-            yield i
+        async def scrape(url, then_summarize):
+            async with scrape_slots:
+                result = await scrape_api(client, url)
+            scrape_bar.update()
+            on_scraped(result)
+            if then_summarize:
+                _, file_name, _ = result
+                await summarize((url, file_name))
+
+        await asyncio.gather(
+            *[scrape(*args) for args in scrape_todo],
+            *[summarize(args) for args in summarize_todo],
+        )
+
+    scrape_bar.close()
+    summarize_bar.close()
+    await flush_writes()
+
+
+def process_all(scrape_todo, summarize_todo, on_scraped, on_summarized):
+    asyncio.run(
+        process_all_async(scrape_todo, summarize_todo, on_scraped, on_summarized)
+    )
 
 
 def input_urls(fname):
@@ -216,60 +694,112 @@ def input_urls(fname):
     return urls
 
 
-def normalize_empty(series: pd.Series) -> pd.Series:
-    """Return a boolean mask where values are considered empty (NaN or empty/whitespace string)."""
-    return series.isna() | (series.astype(str).str.strip() == "")
-
+_index = None  # connection to the SQLite index, opened by update_index
+
+
+def open_index(fname):
+    """Opens the SQLite index, creating it on the first run."""
+    con = sqlite3.connect(fname, isolation_level=None)
+    # WAL + NORMAL: every result is its own commit without an fsync each
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS links(
+            url TEXT PRIMARY KEY,
+            file TEXT NOT NULL DEFAULT '',
+            status TEXT NOT NULL DEFAULT '',
+            summary TEXT NOT NULL DEFAULT '',
+            body_hash TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_body ON links(body_hash);
+        """)
+    return con
+
+
+def import_index(con):
+    """Copies the rows of an index kept by an older version into con."""
+    if os.path.exists("summaries.parquet"):
+        df = pd.read_parquet("summaries.parquet", engine="pyarrow")
+    elif os.path.exists(OUTPUT_FILE):
+        df = pd.read_excel(OUTPUT_FILE, dtype=str)
+    else:
+        return
+    df = df[["url", "file", "status", "summary"]].fillna("")
+    con.execute("BEGIN")
+    con.executemany(
+        "INSERT OR IGNORE INTO links(url, file, status, summary) VALUES (?, ?, ?, ?)",
+        df.itertuples(index=False),
+    )
+    con.execute("COMMIT")
 
-def update_index(fname, urls):
-    if not os.path.exists(fname):
-        columns = ["url", "file", "status", "summary"]
-        df = pd.DataFrame(columns=columns)
-        df.to_excel(fname, sheet_name="links", index=False)
 
-    df = pd.read_excel(fname)
-    df["url"] = df["url"].astype(str)
+def update_index(fname, urls, export_xlsx=False):
+    global _index
+    scan_dirs(SOURCES_DIR, SUMMARIES_DIR)
+    con = _index = open_index(fname)
+    if con.execute("SELECT COUNT(*) FROM links").fetchone()[0] == 0:
+        import_index(con)
 
     # ---------------- PASS 1 ----------------
     # If the URL is not there, add it with all other columns empty
-    existing_urls = set(df["url"])
-    new_rows = []
-    for url in urls:
-        if url not in existing_urls:
-            new_rows.append(
-                {
-                    "url": url,
-                    "file": "",
-                    "status": "",
-                    "summary": "",
-                }
-            )
-    if new_rows:
-        df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-
-    # ---------------- PASS 2 ----------------
+    con.execute("BEGIN")
+    con.executemany(
+        "INSERT OR IGNORE INTO links(url) VALUES (?)", [(url,) for url in urls]
+    )
+    con.execute("COMMIT")
+
+    # Every result is written to its row as soon as it is ready
+    def save_scrape(result):
+        url, file_name, status = result
+        con.execute(
+            "UPDATE links SET file = ?, status = ? WHERE url = ?",
+            (file_name, str(status), url),
+        )
+
+    def save_summary(result):
+        url, summary, key = result
+        con.execute(
+            "UPDATE links SET summary = ?, body_hash = COALESCE(?, body_hash)"
+            " WHERE url = ?",
+            (summary, key, url),
+        )
+
+    # ---------------- PASS 2 + 3 ----------------
     # For every row that doesn't have status set:
     #   set "status" and "file"
-    status_empty_mask = normalize_empty(df["status"])
-
-    todo = [(idx, df.at[idx, "url"]) for idx in df[status_empty_mask].index]
-    for idx, fname, status in process_all(scrape_api, "Processing URLs", todo):
-        df.at[idx, "status"] = status
-        df.at[idx, "file"] = fname
-
-    # ---------------- PASS 3 ----------------
     # For every row that doesn't have summary:
-    #   set "summary"])
-    content_empty_mask = normalize_empty(df["summary"])
-
-    todo = [(idx, df.at[idx, "file"]) for idx in df[content_empty_mask].index]
-    for idx, summary in process_all(summarize_api, "Summarizing URLs", todo):
-        df.at[idx, "summary"] = summary
-
-    df = df.sort_values(by=["status", "url"], ascending=[False, True])
-
-    df.to_excel(OUTPUT_FILE, sheet_name="links", index=False)
-
+    #   set "summary", as soon as its "file" is there
+    if FORCE_RESCRAPE:
+        # Every row is crawled again and summarized from the new text
+        scrape_todo = con.execute("SELECT url, 1 FROM links").fetchall()
+        summarize_todo = []
+    else:
+        scrape_todo = con.execute(
+            "SELECT url, TRIM(summary) = '' FROM links WHERE TRIM(status) = ''"
+        ).fetchall()
+        summarize_todo = con.execute(
+            "SELECT url, file FROM links"
+            " WHERE TRIM(status) != '' AND TRIM(summary) = ''"
+        ).fetchall()
+    process_all(scrape_todo, summarize_todo, save_scrape, save_summary)
+
+    if export_xlsx:
+        df = pd.read_sql(
+            "SELECT url, file, status, summary FROM links ORDER BY status DESC, url",
+            con,
+        )
+        df.to_excel(OUTPUT_FILE, sheet_name="links", index=False, engine="xlsxwriter")
+
+    con.close()
+
+
+parser = argparse.ArgumentParser(description="Bulk web page summarizer")
+parser.add_argument(
+    "--export-xlsx",
+    action="store_true",
+    help=f"also write the index to {OUTPUT_FILE}",
+)
+args = parser.parse_args()
 
 # Ensure aux directories exists
 os.makedirs(SOURCES_DIR, exist_ok=True)
@@ -277,4 +807,4 @@ os.makedirs(SUMMARIES_DIR, exist_ok=True)
 
 urls = input_urls(INPUT_FILE)
 
-update_index(OUTPUT_FILE, urls)
+update_index(INDEX_FILE, urls, args.export_xlsx)